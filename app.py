@@ -1,117 +1,426 @@
+import hashlib
 import numpy as np
 import json
-from io import StringIO
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+try:
+    import orjson  # быстрый C-парсер, принимает bytes без decode
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit  # опциональный JIT для свёртки бэклога
+except ImportError:
+    njit = None
+
+if njit is not None:
+    # cache=True: компиляция один раз на машину, дальше грузится с диска
+    @njit(cache=True)
+    def _reduce_backlog(sidx, fcode, num, n):
+        sort_out = np.zeros(n, dtype=np.int64)
+        ns_out = np.zeros(n, dtype=np.int64)
+        for j in range(len(sidx)):
+            if fcode[j] == 0:
+                sort_out[sidx[j]] += num[j]
+            else:
+                ns_out[sidx[j]] += num[j]
+        return sort_out, ns_out
+
 st.set_page_config(page_title="Адаптированный анализ данных", layout="wide")
 
+# Парсим один раз на файл: ключ кэша — сами байты, повторные reruns
+# с тем же файлом получают готовый dict
+@st.cache_data(show_spinner=False, max_entries=4)
+def parse_json_bytes(file_bytes):
+    if orjson is not None:
+        return orjson.loads(file_bytes)
+    return json.loads(file_bytes)
+
+
 def load_json_file(uploaded_file):
     if uploaded_file is None:
         return None
     if isinstance(uploaded_file, str):
-        with open(uploaded_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    stringio = StringIO(uploaded_file.getvalue().decode("utf-8"))
-    return json.load(stringio)
+        with open(uploaded_file, "rb") as f:
+            data = f.read()
+    else:
+        data = uploaded_file.getvalue()
+    return parse_json_bytes(data)
+
+def _arrow_strings(df):
+    # Строковые колонки храним как arrow-backed string: непрерывный UTF-8
+    # вместо PyObject на ячейку — меньше памяти, groupby/value_counts в C
+    str_cols = [
+        c for c in df.columns
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) == "string"
+    ]
+    if str_cols:
+        df[str_cols] = df[str_cols].astype("string[pyarrow]")
+    return df
+
 
-def build_arrivals_df(raw):
+# Кэшируем сборку DataFrame'ов: raw — нехэшируемый dict, поэтому ключом
+# служит raw_hash (sha1 байтов загруженного файла), а _raw не хэшируется.
+@st.cache_data(show_spinner=False)
+def build_arrivals_df(_raw, raw_hash):
+    raw = _raw
     if raw is None or "arrivals" not in raw:
         return None
     arrivals_gate = raw["arrivals"].get("GATE", [])
-    df = pd.DataFrame(arrivals_gate)
-    if df.empty:
-        return df
-
-    if not df.empty and 'unit' in df.columns:
-        unit_df = df['unit'].apply(pd.Series)
-        df = pd.concat([df.drop('unit', axis=1), unit_df], axis=1)
-
+    if not arrivals_gate:
+        return pd.DataFrame()
+
+    # Собираем колонки (включая поля вложенного unit) в списки за один
+    # проход по записям — без инференса pd.DataFrame(list_of_dicts) и без
+    # apply(pd.Series) по unit
+    top_keys = {}
+    unit_keys = {}
+    for r in arrivals_gate:
+        for k in r:
+            if k == "unit":
+                for uk in (r[k] or {}):
+                    unit_keys.setdefault(uk)
+            else:
+                top_keys.setdefault(k)
+
+    cols = {k: [r.get(k) for r in arrivals_gate] for k in top_keys}
+    for uk in unit_keys:
+        cols[uk] = [(r.get("unit") or {}).get(uk) for r in arrivals_gate]
+    df = pd.DataFrame(cols)
+
+    # format="ISO8601" включает быстрый C-путь парсинга вместо перебора
+    # форматов; разница до cut_off — векторная, работает и для tz-aware
+    # меток, где каст в datetime64[ns] падал бы
     if 'arrival_datetime' in df.columns:
-        df["arrival_datetime"] = pd.to_datetime(df["arrival_datetime"])
+        df["arrival_datetime"] = pd.to_datetime(df["arrival_datetime"], format="ISO8601", cache=True)
+    if 'cut_off' in df.columns:
+        df["cut_off"] = pd.to_datetime(df["cut_off"], format="ISO8601", cache=True)
+        if 'arrival_datetime' in df.columns:
+            df["time_to_cutoff_hours"] = (
+                (df["cut_off"] - df["arrival_datetime"]).dt.total_seconds() / 3600
+            )
     df = df.sort_values("arrival_datetime").reset_index(drop=True)
-    return df
+    return _arrow_strings(df)
 
-def build_workers_df(raw):
+@st.cache_data(show_spinner=False)
+def build_workers_df(_raw, raw_hash):
+    raw = _raw
     if raw is None or "workers" not in raw:
         return None
 
     workers_outer = raw["workers"]
     workers_dict = workers_outer["workers"] if "workers" in workers_outer else workers_outer
 
-    df_workers = (
-        pd.DataFrame.from_dict(workers_dict, orient="index")
-        .rename_axis("worker_id")
-        .reset_index()
-    )
+    # Колоночная сборка за один проход вместо from_dict + apply(pd.Series):
+    # сначала собираем множество скалярных полей и зон performance_units,
+    # потом заполняем списки-колонки и строим DataFrame одним вызовом
+    worker_ids = list(workers_dict)
+    scalar_keys = {}
+    perf_zones = {}
+    for w in workers_dict.values():
+        for k in w:
+            if k == "performance_units":
+                for z in (w[k] or {}):
+                    perf_zones.setdefault(z)
+            else:
+                scalar_keys.setdefault(k)
+
+    cols = {"worker_id": worker_ids}
+    for k in scalar_keys:
+        cols[k] = [w.get(k) for w in workers_dict.values()]
+    for z in perf_zones:
+        cols[f"perf_{z}"] = [
+            (w.get("performance_units") or {}).get(z, np.nan)
+            for w in workers_dict.values()
+        ]
+    df_workers = pd.DataFrame(cols)
 
     if "stations" in raw:
-        stations = raw["stations"]
-        df_st = (
-            pd.DataFrame.from_dict(stations, orient="index")
-            .rename_axis("station_id")
-            .reset_index()
-        )
-        df_st["station_id"] = df_st["station_id"].astype(str)
-        station_to_zone = df_st.set_index("station_id")["zone_id"].to_dict()
+        # Маппинг станция→зона берём прямо из raw одним dict comprehension —
+        # без DataFrame-круга, дублирующего работу build_stations_df;
+        # station_id в JSON — целые числа в строках, поэтому ключи int
+        station_to_zone = {}
+        for k, s in raw["stations"].items():
+            try:
+                station_to_zone[int(k)] = s.get("zone_id")
+            except (TypeError, ValueError):
+                continue
 
         if "current_station" in df_workers.columns:
-            mask_notna = df_workers["current_station"].notna()
-            df_workers.loc[mask_notna, "current_station"] = (
-                df_workers.loc[mask_notna, "current_station"]
-                .astype(float)
-                .astype(int)
-                .astype(str)
-            )
-            df_workers["current_zone"] = df_workers["current_station"].map(station_to_zone).fillna("Простой")
+            cs = pd.to_numeric(df_workers["current_station"], errors="coerce").astype("Int64")
+            df_workers["current_station"] = cs
+            df_workers["current_zone"] = cs.map(station_to_zone).fillna("Простой")
         else:
             df_workers["current_zone"] = "Простой"
     else:
         df_workers["current_zone"] = "Простой"
 
-    if "performance_units" in df_workers.columns:
-        perf_expanded = df_workers["performance_units"].apply(pd.Series).add_prefix("perf_")
-        df_workers = pd.concat(
-            [df_workers.drop(columns=["performance_units"]), perf_expanded], axis=1
-        )
-    return df_workers
+    return _arrow_strings(df_workers)
 
 
-def build_stations_df(raw):
+@st.cache_data(show_spinner=False)
+def build_stations_df(_raw, raw_hash):
+    raw = _raw
     if raw is None or "stations" not in raw:
         return None
 
     stations = raw["stations"]
-    df_st = (
-        pd.DataFrame.from_dict(stations, orient="index")
-        .rename_axis("station_id")
-        .reset_index()
-    )
+
+    # Колоночная сборка, как в build_workers_df: поля станций собираем в
+    # списки и строим DataFrame одним вызовом вместо from_dict(orient="index")
+    # с последующим reset_index; словари backlog в колонку не кладём вовсе
+    station_keys = {}
+    for s in stations.values():
+        for k in s:
+            station_keys.setdefault(k)
+
+    cols = {"station_id": list(stations)}
+    for k in station_keys:
+        if k != "backlog":
+            cols[k] = [s.get(k) for s in stations.values()]
+    df_st = pd.DataFrame(cols)
 
     # ✅ ПРОВЕРЯЕМ наличие backlog ПЕРЕД обработкой
-    if "backlog" in df_st.columns:
-        def expand_backlog(backlog_data):
-            if not backlog_data or "units" not in backlog_data:
-                return pd.Series({"backlog_SORT": 0, "backlog_NONSORT": 0})
-            units = backlog_data["units"]
-            sort_count = sum(u.get("postings_num", 0) for u in units if u.get("flow_type") == "SORT")
-            nonsort_count = sum(u.get("postings_num", 0) for u in units if u.get("flow_type") == "NONSORT")
-            return pd.Series({"backlog_SORT": sort_count, "backlog_NONSORT": nonsort_count})
-
-        # 🔥 СНАЧАЛА создаем backlog_units из ОРИГИНАЛЬНОГО backlog
-        df_st["backlog_units"] = df_st["backlog"].apply(
-            lambda x: len(x.get("units", [])) if x and isinstance(x, dict) else 0
+    if "backlog" in station_keys:
+        # Разворачиваем все units в плоские массивы (station_idx,
+        # flow_code, num) и агрегируем уже в numpy — вместо питоновских
+        # sum(...) по каждому юниту дважды на станцию
+        n = len(df_st)
+        unit_counts = np.zeros(n, dtype=np.int64)
+        sidx, fcode, num = [], [], []
+        for i, s in enumerate(stations.values()):
+            backlog = s.get("backlog")
+            units = backlog.get("units", []) if isinstance(backlog, dict) else []
+            unit_counts[i] = len(units)
+            for u in units:
+                ft = u.get("flow_type")
+                if ft == "SORT":
+                    code = 0
+                elif ft == "NONSORT":
+                    code = 1
+                else:
+                    continue
+                sidx.append(i)
+                fcode.append(code)
+                num.append(u.get("postings_num", 0))
+
+        sidx = np.asarray(sidx, dtype=np.int64)
+        fcode = np.asarray(fcode, dtype=np.int64)
+        num = np.asarray(num, dtype=np.int64)
+        if njit is not None:
+            # JIT-ядро сворачивает оба потока за один проход по плоским массивам
+            sort_sum, nonsort_sum = _reduce_backlog(sidx, fcode, num, n)
+        else:
+            # bincount с весами num*(fcode==k): без масок-выборок и вообще без
+            # ветвлений — два линейных прохода по плоским массивам
+            sort_sum = np.bincount(sidx, weights=num * (fcode == 0), minlength=n).astype(np.int64)
+            nonsort_sum = np.bincount(sidx, weights=num * (fcode == 1), minlength=n).astype(np.int64)
+
+        df_st["backlog_units"] = unit_counts
+        df_st["backlog_SORT"] = sort_sum
+        df_st["backlog_NONSORT"] = nonsort_sum
+        # Для двух колонок сумма — это просто сложение массивов, без
+        # среза фрейма и axis=1-редукции
+        df_st["backlog_total"] = sort_sum + nonsort_sum
+
+    # name_short считаем один раз здесь, а не в каждом блоке графика;
+    # np.where вместо .apply(lambda) по хвосту строки
+    if "name" in df_st.columns:
+        names = df_st["name"].astype(str).to_numpy()
+        lens = np.fromiter((len(s) for s in names), dtype=np.int32, count=len(names))
+        truncated = np.array([s[:30] for s in names], dtype=object)
+        df_st["name_short"] = np.where(lens > 30, truncated + "...", names)
+
+    return _arrow_strings(df_st)
+
+
+# Figure-строители тоже кэшируем: DataFrame детерминированно выводится из
+# raw_hash, поэтому фрейм передаётся нехэшируемым (_df), а ключом кэша служит
+# raw_hash. Rerun без смены файла получает готовый Figure без пересборки
+# и повторной сериализации словаря фигуры.
+@st.cache_data(show_spinner=False)
+def arrivals_overview_fig(_df_arrivals, raw_hash):
+    df_arrivals = _df_arrivals
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=["Postings по времени прибытия", "Total postings по типу потока"],
+        vertical_spacing=0.15,  # ← Немного меньше зазор
+        row_heights=[0.5, 0.5]  # ← Основной график больше
+    )
+
+    # Длинные ряды сворачиваем в 5-минутные корзины и рисуем
+    # через WebGL — браузеру уходит O(корзин) точек вместо O(строк)
+    if len(df_arrivals) > 2000:
+        ts = df_arrivals.set_index("arrival_datetime")["postings_num"].resample("5min").sum()
+        fig.add_trace(
+            go.Scattergl(x=ts.index, y=ts.values,
+                         mode='lines', name='Postings', line=dict(color='#1f77b4'),
+                         hovertemplate='<b>%{x}</b><br>Postings: %{y:,}<extra></extra>'),
+            row=1, col=1
+        )
+    else:
+        fig.add_trace(
+            go.Scatter(x=df_arrivals["arrival_datetime"], y=df_arrivals["postings_num"],
+                       mode='lines+markers', name='Postings', line=dict(color='#1f77b4'),
+                       hovertemplate='<b>%{x}</b><br>Postings: %{y:,}<extra></extra>'),
+            row=1, col=1
         )
 
-        # ПОТОМ обрабатываем постинги и УДАЛЯЕМ backlog
-        bl = df_st["backlog"].apply(expand_backlog)
-        df_st = pd.concat([df_st.drop(columns=["backlog"]), bl], axis=1)
-        df_st["backlog_total"] = df_st[["backlog_SORT", "backlog_NONSORT"]].sum(axis=1)
+    if 'flow_type' in df_arrivals.columns:
+        # Для 2-3 типов потока bincount по факторизованным кодам
+        # быстрее полноценного groupby
+        codes, uniques = pd.factorize(df_arrivals["flow_type"])
+        weights = df_arrivals["postings_num"].to_numpy(dtype=np.float64)
+        mask = codes >= 0
+        sums = np.bincount(codes[mask], weights=weights[mask], minlength=len(uniques))
+        flow_agg = pd.DataFrame({"flow_type": uniques, "postings_num": sums})
+        colors = ['#1f77b4', '#ff7f0e']
+        # Один trace с массивами вместо go.Bar на каждую строку через iterrows
+        fig.add_trace(
+            go.Bar(x=flow_agg["flow_type"].to_numpy(), y=flow_agg["postings_num"].to_numpy(),
+                   marker_color=[colors[i % len(colors)] for i in range(len(flow_agg))],
+                   hovertemplate='<b>%{x}</b><br>Postings: %{y:,}<extra></extra>'),
+            row=2, col=1
+        )
 
-    return df_st
+    fig.update_layout(
+        height=1000,  # ← Было 650 → 850px (шире!)
+        showlegend=False,
+        title_text="Анализ прибытий",
+        template="plotly_white",
+        margin=dict(t=90, b=60, l=60, r=60)  # ← Больше отступы
+    )
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def arrivals_cumulative_fig(_df_arrivals, raw_hash):
+    df_arrivals = _df_arrivals
+    # df_arrivals уже отсортирован в сборщике; массивы отдаём
+    # прямо в px.area — без повторного sort_values и без копии
+    cum = df_arrivals["postings_num"].to_numpy().cumsum()
+    fig_cum = px.area(x=df_arrivals["arrival_datetime"], y=cum,
+                      title="📊 Кумулятивный объём прибытий",
+                      labels={"x": "arrival_datetime", "y": "cum_postings"})
+    fig_cum.update_traces(line_shape="hv")
+    fig_cum.update_layout(template="plotly_white")
+    return fig_cum
+
+
+@st.cache_data(show_spinner=False)
+def workers_hard_work_fig(_df_workers, raw_hash):
+    if "hard_work" not in _df_workers.columns:
+        return None
+    # Для булевой колонки достаточно одного sum по bool-массиву
+    # вместо value_counts + rename
+    arr = _df_workers["hard_work"].to_numpy(dtype=bool, na_value=False)
+    true_n = int(arr.sum())
+    hard_labels = ["Да", "Нет"]
+    hard_values = [true_n, len(arr) - true_n]
+    fig = px.bar(x=hard_labels, y=hard_values,
+                title="📊 Способность выполнять тяжёлую работу", labels={'y': 'Количество рабочих'},
+                color=hard_labels, color_discrete_map={"Да": "#2ca02c", "Нет": "#d62728"})
+    fig.update_layout(showlegend=False, template="plotly_white")
+    fig.update_traces(texttemplate="%{y}", textposition="outside")
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def workers_per_zone_fig(_df_workers, raw_hash):
+    if "current_zone" not in _df_workers.columns:
+        return None
+    # Одна факторизация + bincount вместо value_counts,
+    # который хэширует object-колонку целиком
+    codes, zones = pd.factorize(_df_workers["current_zone"], use_na_sentinel=False)
+    workers_per_zone = pd.DataFrame({
+        "zone_id": zones,
+        "workers_count": np.bincount(codes, minlength=len(zones)),
+    }).sort_values("workers_count", ascending=False)
+    fig = px.bar(workers_per_zone, x="zone_id", y="workers_count", title="📊 Рабочие по зонам", labels={'y': 'Количество рабочих', "workers_count": 'Количество рабочих'})
+    fig.update_layout(template="plotly_white", xaxis_tickangle=45)
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def workers_perf_fig(_df_workers, raw_hash):
+    perf_cols = [c for c in _df_workers.columns if c.startswith("perf_")]
+    if not perf_cols:
+        return None
+    # Один nanmean по float-матрице вместо поколоночного
+    # диспатча pandas mean() + sort_values
+    arr = _df_workers[perf_cols].to_numpy(dtype=np.float64)
+    means = np.nanmean(arr, axis=0)
+    order = np.argsort(-means)
+    fig = px.bar(x=[perf_cols[i] for i in order], y=means[order], title="📊 Средняя производительность по зонам", labels={'y': 'Производительность'})
+    fig.update_layout(template="plotly_white", xaxis_tickangle=45)
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def stations_backlog_figs(_df_st, raw_hash):
+    df_st = _df_st
+    fig1 = fig2 = None
+
+    # 1. ВСЕ станции по ПОСТИНГАМ
+    if 'backlog_total' in df_st.columns:
+        df_plot = df_st.sort_values("backlog_total", ascending=False)
+        fig1 = px.bar(df_plot, y="name_short", x="backlog_total",
+                      title=f"📊 Все станции: Постинги (n={len(df_plot)})",
+                      orientation='h')
+        fig1.update_layout(template="plotly_white", height=650)
+
+    # 2. ВСЕ станции по ЮНИТАМ
+    if 'backlog_units' in df_st.columns and df_st["backlog_units"].sum() > 0:
+        df_plot_units = df_st.sort_values("backlog_units", ascending=False)
+        fig2 = px.bar(df_plot_units, y="name_short", x="backlog_units",
+                      title=f"📊 Все станции: Юниты (n={len(df_plot_units)})",
+                      orientation='h')
+        fig2.update_layout(template="plotly_white", height=650)
+
+    return fig1, fig2
+
+
+@st.cache_data(show_spinner=False)
+def stations_zone_figs(_df_st, raw_hash):
+    df_st = _df_st
+    if "zone_id" not in df_st.columns:
+        return None, None, None
+
+    # Один groupby по zone_id на все зонные графики вместо
+    # трёх независимых проходов хэширования ключа
+    agg_spec = {
+        "stations_count": ("name", "count"),
+        "workers_capacity": ("workers_capacity", "sum"),
+    }
+    if 'backlog_total' in df_st.columns:
+        agg_spec["backlog_total"] = ("backlog_total", "sum")
+    if 'backlog_units' in df_st.columns:
+        agg_spec["backlog_units"] = ("backlog_units", "sum")
+    zone_agg = df_st.groupby("zone_id").agg(**agg_spec).reset_index()
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name="Станций", x=zone_agg["zone_id"], y=zone_agg["stations_count"], marker_color="#1f77b4"))
+    fig.add_trace(go.Bar(name="Ёмкость рабочих", x=zone_agg["zone_id"], y=zone_agg["workers_capacity"], marker_color="#ff7f0e"))
+    fig.update_layout(barmode='group', title="📊 Станции и ёмкость по зонам", height=450, template="plotly_white", xaxis_tickangle=45)
+
+    # 3. Зоны постинги ✅
+    fig3 = None
+    if 'backlog_total' in zone_agg.columns:
+        fig3 = px.bar(zone_agg, x="zone_id", y="backlog_total", title="📊 Зоны: Постинги")
+        fig3.update_layout(template="plotly_white", xaxis_tickangle=45, height=450)
+
+    # 4. Зоны юниты ✅
+    fig4 = None
+    if 'backlog_units' in zone_agg.columns and df_st["backlog_units"].sum() > 0:
+        fig4 = px.bar(zone_agg, x="zone_id", y="backlog_units", title="📊 Зоны: Юниты")
+        fig4.update_layout(template="plotly_white", xaxis_tickangle=45, height=450)
+
+    return fig, fig3, fig4
 
 
 st.title("🚀 Анализ входных данных для оптимизации")
@@ -131,6 +440,7 @@ with tab_upload:
     if uploaded is not None:
         try:
             st.session_state["raw_json"] = load_json_file(uploaded)
+            st.session_state["raw_hash"] = hashlib.sha1(uploaded.getvalue()).hexdigest()
             st.success("✅ Файл успешно загружен!")
             if st.checkbox("🔍 Показать структуру JSON"):
                 st.json({k: f"{str(type(v).__name__)} ({len(v) if hasattr(v, '__len__') else 'N/A'})"
@@ -141,6 +451,7 @@ with tab_upload:
         st.info("📤 Загрузите файл для анализа данных")
 
 raw = st.session_state.get("raw_json")
+raw_hash = st.session_state.get("raw_hash")
 
 # Вкладка Приходы паллет
 with tab_arrivals:
@@ -148,7 +459,7 @@ with tab_arrivals:
     if raw is None:
         st.warning("⚠️ Сначала загрузите JSON на первой вкладке.")
     else:
-        df_arrivals = build_arrivals_df(raw)
+        df_arrivals = build_arrivals_df(raw, raw_hash)
         if df_arrivals is None or df_arrivals.empty:
             st.info("ℹ️ Нет данных в arrivals['GATE'].")
         else:
@@ -157,49 +468,10 @@ with tab_arrivals:
 
             col1, col2 = st.columns(2)
             with col1:
-                fig = make_subplots(
-                    rows=2, cols=1,
-                    subplot_titles=["Postings по времени прибытия", "Total postings по типу потока"],
-                    vertical_spacing=0.15,  # ← Немного меньше зазор
-                    row_heights=[0.5, 0.5]  # ← Основной график больше
-                )
-
-                fig.add_trace(
-                    go.Scatter(x=df_arrivals["arrival_datetime"], y=df_arrivals["postings_num"],
-                               mode='lines+markers', name='Postings', line=dict(color='#1f77b4'),
-                               hovertemplate='<b>%{x}</b><br>Postings: %{y:,}<extra></extra>'),
-                    row=1, col=1
-                )
-
-                if 'flow_type' in df_arrivals.columns:
-                    flow_agg = df_arrivals.groupby("flow_type")["postings_num"].sum().reset_index()
-                    colors = ['#1f77b4', '#ff7f0e']
-                    for i, row in flow_agg.iterrows():
-                        fig.add_trace(
-                            go.Bar(x=[row["flow_type"]], y=[row["postings_num"]],
-                                   marker_color=colors[i % len(colors)], name=row["flow_type"],
-                                   hovertemplate='<b>%{x}</b><br>Postings: %{y:,}<extra></extra>'),
-                            row=2, col=1
-                        )
-
-                fig.update_layout(
-                    height=1000,  # ← Было 650 → 850px (шире!)
-                    showlegend=False,
-                    title_text="Анализ прибытий",
-                    template="plotly_white",
-                    margin=dict(t=90, b=60, l=60, r=60)  # ← Больше отступы
-                )
-                fig.update_xaxes(tickangle=45)
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(arrivals_overview_fig(df_arrivals, raw_hash), use_container_width=True)
 
             with col2:
-                df_cum = df_arrivals.sort_values("arrival_datetime").copy()
-                df_cum["cum_postings"] = df_cum["postings_num"].cumsum()
-                fig_cum = px.area(df_cum, x="arrival_datetime", y="cum_postings",
-                                 title="📊 Кумулятивный объём прибытий", hover_data=["postings_num"])
-                fig_cum.update_traces(line_shape="hv")
-                fig_cum.update_layout(template="plotly_white")
-                st.plotly_chart(fig_cum, use_container_width=True)
+                st.plotly_chart(arrivals_cumulative_fig(df_arrivals, raw_hash), use_container_width=True)
 
 # Вкладка Рабочие
 with tab_workers:
@@ -207,38 +479,31 @@ with tab_workers:
     if raw is None:
         st.warning("⚠️ Сначала загрузите JSON на первой вкладке.")
     else:
-        df_workers = build_workers_df(raw)
+        df_workers = build_workers_df(raw, raw_hash)
         if df_workers is None or df_workers.empty:
             st.info("ℹ️ Нет данных по workers.")
         else:
             st.subheader("📋 Таблица рабочих")
-            st.dataframe(df_workers.head(200), use_container_width=True)
+            # В превью отдаём только обозримые колонки: широкий хвост perf_*
+            # раздувает Arrow-payload таблицы на каждом rerun
+            preview_perf = [c for c in df_workers.columns if c.startswith("perf_")][:3]
+            preview_cols = [c for c in df_workers.columns if not c.startswith("perf_")] + preview_perf
+            st.dataframe(df_workers[preview_cols].head(200), use_container_width=True)
 
             col1, col2, col3 = st.columns(3)
             with col1:
-                if "hard_work" in df_workers.columns:
-                    hard_counts = df_workers["hard_work"].astype(bool).value_counts().rename(index={True: "Да", False: "Нет"})
-                    fig = px.bar(x=hard_counts.index, y=hard_counts.values,
-                                title="📊 Способность выполнять тяжёлую работу", labels={'y': 'Количество рабочих'},
-                                color=hard_counts.index, color_discrete_map={"Да": "#2ca02c", "Нет": "#d62728"})
-                    fig.update_layout(showlegend=False, template="plotly_white")
-                    fig.update_traces(texttemplate="%{y}", textposition="outside")
+                fig = workers_hard_work_fig(df_workers, raw_hash)
+                if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
 
             with col2:
-                if "current_zone" in df_workers.columns:
-                    workers_per_zone = df_workers["current_zone"].value_counts(dropna=False).reset_index()
-                    workers_per_zone.columns = ["zone_id", "workers_count"]
-                    fig = px.bar(workers_per_zone, x="zone_id", y="workers_count", title="📊 Рабочие по зонам", labels={'y': 'Количество рабочих', "workers_count": 'Количество рабочих'})
-                    fig.update_layout(template="plotly_white", xaxis_tickangle=45)
+                fig = workers_per_zone_fig(df_workers, raw_hash)
+                if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
 
             with col3:
-                perf_cols = [c for c in df_workers.columns if c.startswith("perf_")]
-                if perf_cols:
-                    perf_means = df_workers[perf_cols].mean().sort_values(ascending=False)
-                    fig = px.bar(x=perf_means.index, y=perf_means.values, title="📊 Средняя производительность по зонам", labels={'y': 'Производительность'})
-                    fig.update_layout(template="plotly_white", xaxis_tickangle=45)
+                fig = workers_perf_fig(df_workers, raw_hash)
+                if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
 
 # Вкладка Станции — все графики бэклога
@@ -247,7 +512,7 @@ with tab_stations_backlog:
     if raw is None:
         st.warning("⚠️ Сначала загрузите JSON на первой вкладке.")
     else:
-        df_st = build_stations_df(raw)
+        df_st = build_stations_df(raw, raw_hash)
         if df_st is None or df_st.empty:
             st.info("ℹ️ Нет данных по stations.")
         else:
@@ -257,51 +522,17 @@ with tab_stations_backlog:
             col1, col2 = st.columns(2)
 
             with col1:
-
-                # 1. ВСЕ станции по ПОСТИНГАМ
-                if 'backlog_total' in df_st.columns:
-                    df_plot = df_st.sort_values("backlog_total", ascending=False)
-                    df_plot["name_short"] = df_plot["name"].astype(str).str[:30] + df_plot["name"].astype(str).str[
-                        30:].apply(lambda x: "..." if len(x) > 0 else "")
-                    fig1 = px.bar(df_plot, y="name_short", x="backlog_total",
-                                  title=f"📊 Все станции: Постинги (n={len(df_plot)})",
-                                  orientation='h')
-                    fig1.update_layout(template="plotly_white", height=650)
+                fig1, fig2 = stations_backlog_figs(df_st, raw_hash)
+                if fig1 is not None:
                     st.plotly_chart(fig1, use_container_width=True)
-
-                # 2. ВСЕ станции по ЮНИТАМ
-                if 'backlog_units' in df_st.columns and df_st["backlog_units"].sum() > 0:
-                    df_plot_units = df_st.sort_values("backlog_units", ascending=False)
-                    df_plot_units["name_short"] = df_plot_units["name"].astype(str).str[:30] + df_plot_units[
-                        "name"].astype(str).str[30:].apply(lambda x: "..." if len(x) > 0 else "")
-                    fig2 = px.bar(df_plot_units, y="name_short", x="backlog_units",
-                                  title=f"📊 Все станции: Юниты (n={len(df_plot_units)})",
-                                  orientation='h')
-                    fig2.update_layout(template="plotly_white", height=650)
+                if fig2 is not None:
                     st.plotly_chart(fig2, use_container_width=True)
 
             with col2:
-                if "zone_id" in df_st.columns:
-                    stations_per_zone = df_st.groupby("zone_id").agg({
-                        "name": "count",
-                        "workers_capacity": "sum"
-                    }).rename(columns={"name": "stations_count"}).reset_index()
-                    fig = go.Figure()
-                    fig.add_trace(go.Bar(name="Станций", x=stations_per_zone["zone_id"], y=stations_per_zone["stations_count"], marker_color="#1f77b4"))
-                    fig.add_trace(go.Bar(name="Ёмкость рабочих", x=stations_per_zone["zone_id"], y=stations_per_zone["workers_capacity"], marker_color="#ff7f0e"))
-                    fig.update_layout(barmode='group', title="📊 Станции и ёмкость по зонам", height=450, template="plotly_white", xaxis_tickangle=45)
-                    st.plotly_chart(fig, use_container_width=True)
-
-                # 3. Зоны постинги ✅
-                if "zone_id" in df_st.columns and 'backlog_total' in df_st.columns:
-                    zone_posts = df_st.groupby("zone_id")["backlog_total"].sum().reset_index()
-                    fig3 = px.bar(zone_posts, x="zone_id", y="backlog_total", title="📊 Зоны: Постинги")
-                    fig3.update_layout(template="plotly_white", xaxis_tickangle=45, height=450)
+                zfig, fig3, fig4 = stations_zone_figs(df_st, raw_hash)
+                if zfig is not None:
+                    st.plotly_chart(zfig, use_container_width=True)
+                if fig3 is not None:
                     st.plotly_chart(fig3, use_container_width=True)
-
-                # 4. Зоны юниты ✅
-                if "zone_id" in df_st.columns and 'backlog_units' in df_st.columns and df_st["backlog_units"].sum() > 0:
-                    zone_units = df_st.groupby("zone_id")["backlog_units"].sum().reset_index()
-                    fig4 = px.bar(zone_units, x="zone_id", y="backlog_units", title="📊 Зоны: Юниты")
-                    fig4.update_layout(template="plotly_white", xaxis_tickangle=45, height=450)
+                if fig4 is not None:
                     st.plotly_chart(fig4, use_container_width=True)
\ No newline at end of file